@@ -1,10 +1,45 @@
+import collections
+import queue
+import select
+import selectors
 import socket
 import threading
 import tkinter as tk
+from functools import partial
+from ipaddress import IPv4Address
+from tkinter import font as tkfont
 from tkinter import messagebox
 
+from protocol import (
+    OP_DISCONNECT,
+    OP_GAME_OVER,
+    OP_GAME_START,
+    OP_QUES,
+    OP_SCORE,
+    MAX_SERVER_FRAME,
+    encode_frame,
+    parse_frame,
+    split_frames,
+)
+
+
+_LOG_LIMIT = 1000
+_RCVBUF_SIZE = 64 * 1024
+_SEP30 = "=" * 30
+_SEP40 = "-" * 40
+
+
+def _mk_label(parent, text, **kw):
+    return tk.Label(parent, text=text, takefocus=0, highlightthickness=0, **kw)
+
 
 class QuizClient:
+    _ANS_FRAMES = {
+        "A": encode_frame(b"ANS:A"),
+        "B": encode_frame(b"ANS:B"),
+        "C": encode_frame(b"ANS:C"),
+    }
+    
     def __init__(self, root):
         self.root = root
         self.root.title("SUquid Quiz Games - Client")
@@ -12,24 +47,55 @@ class QuizClient:
         self.root.resizable(True, True)
         self.client_socket = None
         self.is_connected = False
+        self._rx_buf = bytearray()
+        self._recv_buf = bytearray(4096)
+        self._read_timeout = None
+        self._connect_q = queue.SimpleQueue()
+        threading.Thread(target=self._io_worker, name="quiz-io", daemon=True).start()
+        self._wakeup_r, self._wakeup_w = socket.socketpair()
+        self._wakeup_r.setblocking(False)
+        self._wakeup_w.setblocking(False)
         self.selected_answer = tk.StringVar()
+        self._last_answer = ""
+        self._handlers = {
+            OP_GAME_START: self._on_game_start,
+            OP_QUES: self._on_question,
+            OP_SCORE: self._on_score,
+            OP_DISCONNECT: self._on_disconnect,
+            OP_GAME_OVER: self._on_game_over,
+        }
+        self._ui_queue = collections.deque()
+        self._ui_wakeup_pending = False
+        self._ui_notify_r = self._ui_notify_w = None
+        self._ui_notify_buf = bytearray(64)
+        self._ui_ops = {
+            "error": messagebox.showerror,
+            "enable": self._enable_game_area,
+            "disable": self._disable_game_area,
+            "question": self._update_question_ui,
+            "reset": self._reset_ui,
+        }
         self._create_widgets()
+        if hasattr(self.root.tk, "createfilehandler"):
+            self._ui_notify_r, self._ui_notify_w = socket.socketpair()
+            self._ui_notify_r.setblocking(False)
+            self._ui_notify_w.setblocking(False)
+            self.root.tk.createfilehandler(self._ui_notify_r, tk.READABLE, self._on_ui_notify)
+        else:
+            self.root.after(33, self._poll_ui_queue)
     
     def _create_widgets(self):
         config_frame = tk.Frame(self.root, padx=10, pady=10)
         config_frame.pack(fill=tk.X)
-        ip_label = tk.Label(config_frame, text="Server IP:")
-        ip_label.pack(side=tk.LEFT)
+        _mk_label(config_frame, "Server IP:").pack(side=tk.LEFT)
         self.ip_entry = tk.Entry(config_frame, width=12)
         self.ip_entry.pack(side=tk.LEFT, padx=(5, 10))
         self.ip_entry.insert(0, "127.0.0.1")
-        port_label = tk.Label(config_frame, text="Port:")
-        port_label.pack(side=tk.LEFT)
+        _mk_label(config_frame, "Port:").pack(side=tk.LEFT)
         self.port_entry = tk.Entry(config_frame, width=7)
         self.port_entry.pack(side=tk.LEFT, padx=(5, 10))
         self.port_entry.insert(0, "12345")
-        username_label = tk.Label(config_frame, text="Username:")
-        username_label.pack(side=tk.LEFT)
+        _mk_label(config_frame, "Username:").pack(side=tk.LEFT)
         self.username_entry = tk.Entry(config_frame, width=12)
         self.username_entry.pack(side=tk.LEFT, padx=(5, 10))
         self.connect_button = tk.Button(
@@ -40,8 +106,7 @@ class QuizClient:
         self.connect_button.pack(side=tk.LEFT)
         log_frame = tk.Frame(self.root, padx=10, pady=5)
         log_frame.pack(fill=tk.BOTH, expand=True)
-        log_label = tk.Label(log_frame, text="Client Log:")
-        log_label.pack(anchor=tk.W)
+        _mk_label(log_frame, "Client Log:").pack(anchor=tk.W)
         scrollbar = tk.Scrollbar(log_frame)
         scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
         self.log_listbox = tk.Listbox(
@@ -54,10 +119,12 @@ class QuizClient:
         scrollbar.config(command=self.log_listbox.yview)
         self.game_frame = tk.LabelFrame(self.root, text="Game Area", padx=10, pady=10)
         self.game_frame.pack(fill=tk.X, padx=10, pady=10)
-        self.question_label = tk.Label(
+        self._question_font = tkfont.Font(family="Arial", size=12, weight="bold")
+        self._option_font = tkfont.Font(family="Arial", size=10)
+        self.question_label = _mk_label(
             self.game_frame,
-            text="Waiting for game to start...",
-            font=("Arial", 12, "bold"),
+            "Waiting for game to start...",
+            font=self._question_font,
             wraplength=500,
             justify=tk.LEFT
         )
@@ -69,7 +136,8 @@ class QuizClient:
             text="A) Option A",
             variable=self.selected_answer,
             value="A",
-            font=("Arial", 10),
+            command=partial(self._select_answer, "A"),
+            font=self._option_font,
             state=tk.DISABLED
         )
         self.option_a_radio.pack(anchor=tk.W, pady=2)
@@ -78,7 +146,8 @@ class QuizClient:
             text="B) Option B",
             variable=self.selected_answer,
             value="B",
-            font=("Arial", 10),
+            command=partial(self._select_answer, "B"),
+            font=self._option_font,
             state=tk.DISABLED
         )
         self.option_b_radio.pack(anchor=tk.W, pady=2)
@@ -87,10 +156,15 @@ class QuizClient:
             text="C) Option C",
             variable=self.selected_answer,
             value="C",
-            font=("Arial", 10),
+            command=partial(self._select_answer, "C"),
+            font=self._option_font,
             state=tk.DISABLED
         )
         self.option_c_radio.pack(anchor=tk.W, pady=2)
+        self._option_radios = (self.option_a_radio, self.option_b_radio, self.option_c_radio)
+        self._default_option_texts = ("A) Option A", "B) Option B", "C) Option C")
+        self._option_texts = self._default_option_texts
+        self._options_state = tk.DISABLED
         self.submit_button = tk.Button(
             self.game_frame,
             text="Submit Answer",
@@ -100,73 +174,129 @@ class QuizClient:
         self.submit_button.pack(anchor=tk.W, pady=(10, 0))
         self.root.protocol("WM_DELETE_WINDOW", self._on_closing)
     
+    def _post(self, *op):
+        self._ui_queue.append(op)
+        if self._ui_notify_w is not None and not self._ui_wakeup_pending:
+            self._ui_wakeup_pending = True
+            try:
+                self._ui_notify_w.send(b"\0")
+            except BlockingIOError:
+                pass
+    
+    def _on_ui_notify(self, fileobj, mask):
+        try:
+            while self._ui_notify_r.recv_into(self._ui_notify_buf):
+                pass
+        except BlockingIOError:
+            pass
+        self._ui_wakeup_pending = False
+        self._drain_ui_queue()
+    
+    def _poll_ui_queue(self):
+        try:
+            self._drain_ui_queue()
+        finally:
+            self.root.after(33, self._poll_ui_queue)
+    
+    def _drain_ui_queue(self):
+        popleft = self._ui_queue.popleft
+        pending_logs = []
+        try:
+            while True:
+                op = popleft()
+                if op[0] == "log":
+                    pending_logs.append(op[1])
+                    continue
+                if op[0] == "log_many":
+                    pending_logs.extend(op[1])
+                    continue
+                if pending_logs:
+                    self._append_log(*pending_logs)
+                    pending_logs = []
+                self._apply(op)
+        except IndexError:
+            pass
+        finally:
+            if pending_logs:
+                self._append_log(*pending_logs)
+    
+    def _apply(self, op):
+        self._ui_ops[op[0]](*op[1:])
+    
     def _log(self, message):
-        self.root.after(0, lambda: self._append_log(message))
+        self._post("log", message)
+    
+    def _log_lines(self, lines):
+        self._post("log_many", lines)
     
-    def _append_log(self, message):
-        self.log_listbox.insert(tk.END, message)
-        self.log_listbox.see(tk.END)
+    def _append_log(self, *messages):
+        listbox = self.log_listbox
+        listbox.insert(tk.END, *messages)
+        overflow = listbox.size() - _LOG_LIMIT
+        if overflow > 0:
+            listbox.delete(0, overflow - 1)
+        listbox.see(tk.END)
     
     def _show_error(self, title, message):
-        self.root.after(0, lambda: messagebox.showerror(title, message))
+        if threading.current_thread() is threading.main_thread():
+            messagebox.showerror(title, message)
+        else:
+            self._post("error", title, message)
     
     def _validate_ip(self, ip_string):
-        parts = ip_string.split('.')
-        if len(parts) != 4:
+        try:
+            IPv4Address(ip_string)
+        except ValueError:
             return False
-        
-        for part in parts:
-            try:
-                num = int(part)
-                if num < 0 or num > 255:
-                    return False
-            except ValueError:
-                return False
-        
         return True
     
+    def _set_options_state(self, state, texts=None):
+        if texts is None or texts == self._option_texts:
+            if state == self._options_state:
+                return
+            for radio in self._option_radios:
+                radio.config(state=state)
+        else:
+            for radio, text in zip(self._option_radios, texts):
+                radio.config(text=text, state=state)
+            self._option_texts = texts
+        self.submit_button.config(state=state)
+        self._options_state = state
+    
+    def _clear_selection(self):
+        if self._last_answer:
+            self._last_answer = ""
+            self.selected_answer.set("")
+    
     def _enable_game_area(self):
-        self.option_a_radio.config(state=tk.NORMAL)
-        self.option_b_radio.config(state=tk.NORMAL)
-        self.option_c_radio.config(state=tk.NORMAL)
-        self.submit_button.config(state=tk.NORMAL)
+        self._set_options_state(tk.NORMAL)
         self.question_label.config(text="Get ready! First question coming...")
-        self.selected_answer.set("")
+        self._clear_selection()
     
     def _disable_game_area(self):
-        self.option_a_radio.config(state=tk.DISABLED)
-        self.option_b_radio.config(state=tk.DISABLED)
-        self.option_c_radio.config(state=tk.DISABLED)
-        self.submit_button.config(state=tk.DISABLED)
+        self._set_options_state(tk.DISABLED, self._default_option_texts)
         self.question_label.config(text="Waiting for game to start...")
-        self.option_a_radio.config(text="A) Option A")
-        self.option_b_radio.config(text="B) Option B")
-        self.option_c_radio.config(text="C) Option C")
-        self.selected_answer.set("")
+        self._clear_selection()
     
     def _update_question_ui(self, question, opt_a, opt_b, opt_c):
         self.question_label.config(text=question)
-        self.option_a_radio.config(text=f"A) {opt_a}", state=tk.NORMAL)
-        self.option_b_radio.config(text=f"B) {opt_b}", state=tk.NORMAL)
-        self.option_c_radio.config(text=f"C) {opt_c}", state=tk.NORMAL)
-        self.submit_button.config(state=tk.NORMAL)
-        self.selected_answer.set("")
+        self._set_options_state(tk.NORMAL, (f"A) {opt_a}", f"B) {opt_b}", f"C) {opt_c}"))
+        self._clear_selection()
     
     def _disable_answer_ui(self):
-        self.option_a_radio.config(state=tk.DISABLED)
-        self.option_b_radio.config(state=tk.DISABLED)
-        self.option_c_radio.config(state=tk.DISABLED)
-        self.submit_button.config(state=tk.DISABLED)
+        self._set_options_state(tk.DISABLED)
         self.question_label.config(text="Waiting for other players...")
     
+    def _select_answer(self, answer):
+        self._last_answer = answer
+    
     def _submit_answer(self):
-        answer = self.selected_answer.get()
+        answer = self._last_answer
         if not answer:
             messagebox.showwarning("No Selection", "Please select an answer before submitting.")
             return
         try:
-            answer_message = f"ANS:{answer}"
-            self.client_socket.send(answer_message.encode('utf-8'))
+            self._send(self._ANS_FRAMES[answer])
             self._log(f"Sent answer: {answer}")
         except socket.error as e:
             self._log(f"Error sending answer: {e}")
@@ -180,11 +310,7 @@ class QuizClient:
         if not self._validate_ip(ip_str):
             messagebox.showerror("Invalid IP", "Please enter a valid IP address (e.g., 127.0.0.1).")
             return
-        try:
-            port = int(port_str)
-            if port < 1 or port > 65535:
-                raise ValueError("Port out of range")
-        except ValueError:
+        if not (port_str.isdecimal() and len(port_str) <= 5 and 1 <= (port := int(port_str)) <= 65535):
             messagebox.showerror("Invalid Port", "Please enter a valid port number (1-65535).")
             return
         if not username:
@@ -195,97 +321,149 @@ class QuizClient:
         self.port_entry.config(state=tk.DISABLED)
         self.username_entry.config(state=tk.DISABLED)
         self._log(f"Connecting to {ip_str}:{port} as '{username}'...")
-        connection_thread = threading.Thread(
-            target=self._handle_connection, 
-            args=(ip_str, port, username),
-            daemon=True
-        )
-        connection_thread.start()
+        self._connect_q.put((ip_str, port, username))
+    
+    def _io_worker(self):
+        get = self._connect_q.get
+        while True:
+            try:
+                self._handle_connection(*get())
+            except Exception as e:
+                self._log(f"Connection error: {e}")
+    
+    def _iter_frames(self):
+        sock = self.client_socket
+        recv_into = sock.recv_into
+        recv_view = memoryview(self._recv_buf)
+        rx_buf = self._rx_buf
+        wakeup = self._wakeup_r
+        with selectors.DefaultSelector() as selector:
+            selector.register(sock, selectors.EVENT_READ)
+            selector.register(wakeup, selectors.EVENT_READ)
+            wait = selector.select
+            while True:
+                try:
+                    received = recv_into(recv_view)
+                except BlockingIOError:
+                    events = wait(self._read_timeout)
+                    if not events:
+                        raise TimeoutError("timed out waiting for the server")
+                    for key, _ in events:
+                        if key.fileobj is wakeup:
+                            return
+                    continue
+                if not received:
+                    return
+                rx_buf += recv_view[:received]
+                yield from split_frames(rx_buf, MAX_SERVER_FRAME)
+    
+    def _send(self, payload):
+        sock = self.client_socket
+        view = memoryview(payload)
+        while view:
+            try:
+                sent = sock.send(view)
+            except BlockingIOError:
+                select.select([], [sock], [], 1.0)
+                continue
+            view = view[sent:]
+    
+    def _dispatch(self, frame):
+        opcode, fields = parse_frame(frame)
+        handler = self._handlers.get(opcode)
+        if handler:
+            handler(fields)
+        else:
+            self._log("Received: " + fields[0])
+    
+    def _on_game_start(self, fields):
+        self._log("Game is starting!")
+        self._post("enable")
+    
+    def _on_question(self, fields):
+        if len(fields) == 4:
+            question, opt_a, opt_b, opt_c = fields
+            self._log(f"Question: {question}")
+            self._post("question", question, opt_a, opt_b, opt_c)
+        else:
+            self._log(f"Invalid question format: QUES|{'|'.join(fields)}")
+    
+    def _on_score(self, fields):
+        if len(fields) == 4:
+            result, points_earned, total_score, scoreboard = fields
+            self._log_lines([
+                _SEP30,
+                f"You answered: {result}",
+                f"Points earned: +{points_earned}",
+                f"Your total score: {total_score}",
+                "--- Current Standings ---",
+                *[f"  {line}" for line in scoreboard.splitlines()],
+                _SEP30,
+            ])
+        else:
+            self._log(f"Invalid score format: SCORE|{'|'.join(fields)}")
+    
+    def _on_disconnect(self, fields):
+        if fields:
+            disconnected_user = fields[0]
+            self._log(f"Player '{disconnected_user}' has disconnected.")
+    
+    def _on_game_over(self, fields):
+        self._log(_SEP30)
+        self._log("GAME OVER!")
+        self._log(_SEP30)
+        self._log("Waiting for next game...")
+        self._post("disable")
     
     def _handle_connection(self, ip, port, username):
         try:
             self.client_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            if self.client_socket.getsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF) < _RCVBUF_SIZE:
+                self.client_socket.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, _RCVBUF_SIZE)
+            self.client_socket.settimeout(5.0)
             self.client_socket.connect((ip, port))
+            self.client_socket.settimeout(None)
+            self.client_socket.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            self.client_socket.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+            self._rx_buf.clear()
             self._log(f"Connected to server at {ip}:{port}")
             self._log(f"Sending username: '{username}'")
-            self.client_socket.send(username.encode('utf-8'))
-            auth_response = self.client_socket.recv(1024).decode('utf-8')
-            if auth_response == "REJECT":
+            self.client_socket.sendall(encode_frame(username.encode('utf-8')))
+            self.client_socket.setblocking(False)
+            self._read_timeout = 5.0
+            frames = self._iter_frames()
+            auth_frame = next(frames, None)
+            self._read_timeout = None
+            if auth_frame is None:
+                self._log("Server closed the connection")
+                return
+            if auth_frame == b"REJECT":
                 self._log("Connection rejected: Username taken.")
                 self._show_error("Authentication Failed", "Username is already taken. Please choose a different username.")
                 return
-            elif auth_response == "OK":
+            elif auth_frame == b"OK":
                 self._log("Successfully connected to the lobby.")
                 self.is_connected = True
             else:
-                self._log(f"Unexpected server response: {auth_response}")
+                self._log(f"Unexpected server response: {auth_frame.decode('utf-8', 'replace')}")
                 return
-            while self.is_connected:
-                data = self.client_socket.recv(1024)
-                if data:
-                    message = data.decode('utf-8')
-                    if message == "GAME_START":
-                        self._log("Game is starting!")
-                        self.root.after(0, self._enable_game_area)
-                    elif message.startswith("QUES|"):
-                        parts = message.split("|")
-                        if len(parts) >= 5:
-                            question = parts[1]
-                            opt_a = parts[2]
-                            opt_b = parts[3]
-                            opt_c = parts[4]
-                            self._log(f"Question: {question}")
-                            self.root.after(0, lambda q=question, a=opt_a, b=opt_b, c=opt_c: 
-                                           self._update_question_ui(q, a, b, c))
-                        else:
-                            self._log(f"Invalid question format: {message}")
-                    elif message.startswith("SCORE|"):
-                        parts = message.split("|")
-                        if len(parts) >= 5:
-                            result = parts[1]
-                            points_earned = parts[2]
-                            total_score = parts[3]
-                            scoreboard = parts[4]
-                            self._log("=" * 30)
-                            self._log(f"You answered: {result}")
-                            self._log(f"Points earned: +{points_earned}")
-                            self._log(f"Your total score: {total_score}")
-                            self._log("--- Current Standings ---")
-                            for line in scoreboard.split("\n"):
-                                self._log(f"  {line}")
-                            self._log("=" * 30)
-                        else:
-                            self._log(f"Invalid score format: {message}")
-                    elif message.startswith("DISCONNECT|"):
-                        parts = message.split("|")
-                        if len(parts) >= 2:
-                            disconnected_user = parts[1]
-                            self._log(f"Player '{disconnected_user}' has disconnected.")
-                    elif message == "GAME_OVER":
-                        self._log("=" * 30)
-                        self._log("GAME OVER!")
-                        self._log("=" * 30)
-                        self._log("Waiting for next game...")
-                        self.root.after(0, self._disable_game_area)
-                    else:
-                        self._log(f"Received: {message}")
-                else:
-                    self._log("Server closed the connection")
+            dispatch = self._dispatch
+            for frame in frames:
+                if not self.is_connected:
                     break
+                dispatch(frame)
+            if self.is_connected:
+                self._log("Server closed the connection")
             
-        except socket.error as e:
+        except (socket.error, ValueError) as e:
             self._log(f"Connection error: {e}")
         
         finally:
             self.is_connected = False
-            if self.client_socket:
-                try:
-                    self.client_socket.close()
-                except socket.error:
-                    pass
+            self._close_socket()
             self._log("Disconnected from server")
-            self._log("-" * 40)
-            self.root.after(0, self._reset_ui)
+            self._log(_SEP40)
+            self._post("reset")
     
     def _reset_ui(self):
         self.connect_button.config(state=tk.NORMAL)
@@ -294,13 +472,24 @@ class QuizClient:
         self.username_entry.config(state=tk.NORMAL)
         self._disable_game_area()
     
-    def _on_closing(self):
-        self.is_connected = False
+    def _close_socket(self):
         if self.client_socket:
+            try:
+                self.client_socket.shutdown(socket.SHUT_RDWR)
+            except socket.error:
+                pass
             try:
                 self.client_socket.close()
             except socket.error:
                 pass
+    
+    def _on_closing(self):
+        self.is_connected = False
+        try:
+            self._wakeup_w.send(b"\0")
+        except OSError:
+            pass
+        self._close_socket()
         self.root.destroy()
 
 
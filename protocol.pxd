@@ -0,0 +1,15 @@
+cimport cython
+
+
+cpdef bytes encode_frame(bytes payload)
+
+cpdef list encode_frame_parts(list parts)
+
+@cython.locals(start=Py_ssize_t, end=Py_ssize_t, available=Py_ssize_t, length=Py_ssize_t)
+cpdef list split_frames(bytearray buf, Py_ssize_t max_frame=*)
+
+@cython.locals(length=Py_ssize_t, end=Py_ssize_t)
+cpdef bytes next_frame(bytearray buf, Py_ssize_t max_frame=*)
+
+@cython.locals(opcode=int, max_splits=int)
+cpdef tuple parse_frame(bytes data)
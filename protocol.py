@@ -0,0 +1,93 @@
+import re
+import struct
+
+
+HEADER = struct.Struct(">I")
+HEADER_SIZE = HEADER.size
+MAX_FRAME = 4 * 1024
+MAX_SERVER_FRAME = 1024 * 1024
+
+
+def encode_frame(payload):
+    return HEADER.pack(len(payload)) + payload
+
+
+def encode_frame_parts(parts):
+    return [HEADER.pack(sum(map(len, parts)))] + parts
+
+
+def split_frames(buf, max_frame=MAX_FRAME):
+    frames = []
+    start = 0
+    available = len(buf)
+    with memoryview(buf) as view:
+        while available - start >= HEADER_SIZE:
+            (length,) = HEADER.unpack_from(view, start)
+            if length > max_frame:
+                raise ValueError(f"frame length {length} exceeds {max_frame}")
+            end = start + HEADER_SIZE + length
+            if end > available:
+                break
+            frames.append(bytes(view[start + HEADER_SIZE:end]))
+            start = end
+    if start:
+        del buf[:start]
+    return frames
+
+
+def next_frame(buf, max_frame=MAX_FRAME):
+    if len(buf) < HEADER_SIZE:
+        return None
+    (length,) = HEADER.unpack_from(buf, 0)
+    if length > max_frame:
+        raise ValueError(f"frame length {length} exceeds {max_frame}")
+    end = HEADER_SIZE + length
+    if end > len(buf):
+        return None
+    with memoryview(buf) as view:
+        frame = bytes(view[HEADER_SIZE:end])
+    del buf[:end]
+    return frame
+
+
+OP_UNKNOWN = -1
+OP_GAME_START = 0
+OP_GAME_OVER = 1
+OP_QUES = 2
+OP_SCORE = 3
+OP_DISCONNECT = 4
+
+_OPCODES = {
+    b"GAME_START": OP_GAME_START,
+    b"GAME_OVER": OP_GAME_OVER,
+    b"QUES": OP_QUES,
+    b"SCORE": OP_SCORE,
+    b"DISCONNECT": OP_DISCONNECT,
+}
+_MAX_SPLITS = {
+    OP_GAME_START: -1,
+    OP_GAME_OVER: -1,
+    OP_QUES: 3,
+    OP_SCORE: 3,
+    OP_DISCONNECT: 1,
+}
+
+
+_FRAME_RE = re.compile(
+    rb"(" + b"|".join(map(re.escape, _OPCODES)) + rb")(?:\|(.*))?\Z",
+    re.DOTALL,
+)
+
+
+def parse_frame(data):
+    match = _FRAME_RE.match(data)
+    if match is None:
+        return OP_UNKNOWN, (data.decode('utf-8', 'replace'),)
+    opcode = _OPCODES[match.group(1)]
+    body = match.group(2)
+    max_splits = _MAX_SPLITS[opcode]
+    if body is None or max_splits < 0:
+        return opcode, ()
+    return opcode, tuple([
+        field.decode('utf-8', 'replace') for field in body.split(b"|", max_splits)
+    ])
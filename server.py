@@ -1,8 +1,102 @@
+import bisect
+import collections
+import functools
+import selectors
 import socket
+import sys
 import threading
 import tkinter as tk
+from dataclasses import dataclass, field
+from operator import attrgetter
 from tkinter import messagebox, filedialog
 
+from protocol import encode_frame, encode_frame_parts, next_frame, split_frames
+
+try:
+    from fastrlock.rlock import FastRLock
+except ImportError:
+    FastRLock = threading.RLock
+
+
+Question = collections.namedtuple("Question", "q a b c ans payload")
+
+
+@dataclass(slots=True)
+class Client:
+    username: str
+    sock: socket.socket
+    username_bytes: bytes
+    outbox: collections.deque = field(default_factory=collections.deque)
+    write_evt: threading.Event = field(default_factory=threading.Event)
+    connected: bool = True
+    join_order: int = 0
+    score: int = 0
+    points: int = 0
+    answer: str | None = None
+    answer_seq: int = 0
+
+
+_ANS_CANON = {letter: sys.intern(letter) for letter in ("A", "B", "C")}
+_HAS_SENDMSG = hasattr(socket.socket, "sendmsg")
+_TCP_QUICKACK = getattr(socket, "TCP_QUICKACK", None)
+_MSG_DONTWAIT = getattr(socket, "MSG_DONTWAIT", 0)
+_LOG_BACKLOG = 10000
+_LOG_LIMIT = 2000
+_LOG_BATCH = 100
+_OUTBOX_LIMIT = 64
+_SNDBUF_SIZE = 256 * 1024
+_KEEPALIVE_OPTS = tuple(
+    (getattr(socket, name), value)
+    for name, value in (("TCP_KEEPIDLE", 30), ("TCP_KEEPINTVL", 10), ("TCP_KEEPCNT", 3))
+    if hasattr(socket, name)
+)
+
+_FRAME_GAME_START = encode_frame(b"GAME_START")
+_FRAME_GAME_OVER = encode_frame(b"GAME_OVER")
+_FRAME_OK = encode_frame(b"OK")
+_FRAME_REJECT = encode_frame(b"REJECT")
+_FRAME_REJECT_IN_PROGRESS = encode_frame(b"REJECT|GAME_IN_PROGRESS")
+_DISCONNECT_PREFIX = b"DISCONNECT|"
+
+
+def _make_question(q, a, b, c, ans_line):
+    ans = ans_line.rpartition(":")[2].strip().upper()
+    return Question(
+        q, a, b, c,
+        _ANS_CANON.get(ans, ans),
+        encode_frame(b"|".join([b"QUES", *(part.encode('utf-8') for part in (q, a, b, c))]))
+    )
+
+
+@functools.lru_cache(maxsize=256)
+def _encode_field(value):
+    return str(value).encode('utf-8')
+
+
+def _sendmsg_all(sock, buffers):
+    if not _HAS_SENDMSG:
+        sock.sendall(b"".join(buffers))
+        return
+    views = [memoryview(buf) for buf in buffers if buf]
+    while views:
+        sent = sock.sendmsg(views)
+        while sent:
+            size = len(views[0])
+            if sent < size:
+                views[0] = views[0][sent:]
+                break
+            sent -= size
+            del views[0]
+
+
+def _apply_sock_opts(sock):
+    sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+    for option, value in _KEEPALIVE_OPTS:
+        sock.setsockopt(socket.IPPROTO_TCP, option, value)
+    if sock.getsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF) < _SNDBUF_SIZE:
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, _SNDBUF_SIZE)
+
 
 class QuizServer:
     def __init__(self, root):
@@ -11,17 +105,32 @@ class QuizServer:
         self.root.geometry("550x500")
         self.root.resizable(True, True)
         self.server_socket = None
+        self._wakeup_r = None
+        self._wakeup_w = None
         self.is_running = False
         self.connected_clients = {}
-        self.clients_lock = threading.Lock()
-        self.questions = []
+        self._clients_snapshot = ()
+        self._players = {}
+        self.clients_lock = FastRLock()
+        self._selector = selectors.DefaultSelector()
+        self._recv_view = memoryview(bytearray(65536))
+        self.questions = ()
         self.current_question_index = 0
-        self.current_answers = {}
+        self._answer_seq = 0
+        self._answers_remaining = 0
+        self._first_correct = None
         self.game_in_progress = False
         self.num_questions_to_play = 0
-        self.player_scores = {}
-        self.answer_arrival_order = []
+        self._game_questions = ()
+        self._ranked = []
+        self._score_version = 0
+        self._cached_version = -1
+        self._cached_scoreboard = ""
+        self._cached_scoreboard_bytes = b""
+        self._log_queue = collections.deque(maxlen=_LOG_BACKLOG)
+        self._start_button_state = tk.DISABLED
         self._create_widgets()
+        self.root.after(50, self._drain_log)
 
     def _create_widgets(self):
         config_frame = tk.Frame(self.root, padx=10, pady=10)
@@ -63,22 +172,47 @@ class QuizServer:
         log_label.pack(anchor=tk.W)
         scrollbar = tk.Scrollbar(log_frame)
         scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
-        self.log_listbox = tk.Listbox(
+        self.log_text = tk.Text(
             log_frame,
             height=15,
             width=60,
+            wrap=tk.NONE,
+            state=tk.DISABLED,
             yscrollcommand=scrollbar.set
         )
-        self.log_listbox.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
-        scrollbar.config(command=self.log_listbox.yview)
+        self.log_text.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        scrollbar.config(command=self.log_text.yview)
         self.root.protocol("WM_DELETE_WINDOW", self._on_closing)
 
     def _log(self, message):
-        self.root.after(0, lambda: self._append_log(message))
+        self._log_queue.append(message)
 
-    def _append_log(self, message):
-        self.log_listbox.insert(tk.END, message)
-        self.log_listbox.see(tk.END)
+    def _log_lines(self, lines):
+        self._log_queue.extend(lines)
+
+    def _drain_log(self):
+        popleft = self._log_queue.popleft
+        messages = []
+        try:
+            for _ in range(_LOG_BATCH):
+                messages.append(popleft())
+        except IndexError:
+            pass
+        try:
+            if messages:
+                self._append_log(*messages)
+        finally:
+            self.root.after(50, self._drain_log)
+
+    def _append_log(self, *messages):
+        log_text = self.log_text
+        log_text.config(state=tk.NORMAL)
+        log_text.insert(tk.END, "\n".join(messages) + "\n")
+        lines = int(log_text.index("end-1c").split(".")[0]) - 1
+        if lines > _LOG_LIMIT:
+            log_text.delete("1.0", f"{lines - _LOG_LIMIT + 1}.0")
+        log_text.see(tk.END)
+        log_text.config(state=tk.DISABLED)
 
     def _load_questions(self):
         file_path = filedialog.askopenfilename(
@@ -89,8 +223,8 @@ class QuizServer:
             return
         try:
             with open(file_path, 'r', encoding='utf-8') as f:
-                lines = [line.strip() for line in f.readlines() if line.strip()]
-            self.questions = []
+                lines = [line for line in map(str.strip, f.read().split('\n')) if line]
+            self.questions = ()
             if len(lines) % 5 != 0:
                 messagebox.showwarning(
                     "Invalid Format",
@@ -99,17 +233,12 @@ class QuizServer:
                     "Question, Option A, Option B, Option C, Answer"
                 )
                 return
-            for i in range(0, len(lines), 5):
-                question_dict = {
-                    'q': lines[i],
-                    'options': [
-                        lines[i + 1],
-                        lines[i + 2],
-                        lines[i + 3]
-                    ],
-                    'ans': lines[i + 4].split(":")[-1].strip().upper()
-                }
-                self.questions.append(question_dict)
+            self.questions = tuple(
+                _make_question(q, a, b, c, ans)
+                for q, a, b, c, ans in zip(
+                    lines[0::5], lines[1::5], lines[2::5], lines[3::5], lines[4::5]
+                )
+            )
             self._log(f"Loaded {len(self.questions)} questions from file")
             self.num_questions_entry.delete(0, tk.END)
             self.num_questions_entry.insert(0, str(len(self.questions)))
@@ -119,18 +248,18 @@ class QuizServer:
             messagebox.showerror("Error", f"Failed to load questions file:\n{e}")
 
     def _check_start_conditions(self):
-        def update_button():
-            with self.clients_lock:
-                num_clients = len(self.connected_clients)
+        with self.clients_lock:
             questions_loaded = len(self.questions) > 0
-            enough_clients = num_clients >= 2
+            enough_clients = len(self.connected_clients) >= 2
             game_not_running = not self.game_in_progress
             if questions_loaded and enough_clients and game_not_running:
-                self.start_game_button.config(state=tk.NORMAL)
+                state = tk.NORMAL
             else:
-                self.start_game_button.config(state=tk.DISABLED)
-
-        self.root.after(0, update_button)
+                state = tk.DISABLED
+            if state == self._start_button_state:
+                return
+            self._start_button_state = state
+        self.root.after(0, lambda: self.start_game_button.config(state=state))
 
     def _start_game(self):
         try:
@@ -145,6 +274,7 @@ class QuizServer:
                 f"Please enter a valid number of questions (1-{len(self.questions)}).\n{e}"
             )
             return
+        questions = self.questions[:num_questions]
         with self.clients_lock:
             if len(self.connected_clients) < 2:
                 messagebox.showerror(
@@ -153,21 +283,28 @@ class QuizServer:
                 )
                 return
             self.current_question_index = 0
-            self.current_answers = {}
+            self._answer_seq = 0
+            self._first_correct = None
             self.game_in_progress = True
+            self._start_button_state = tk.DISABLED
             self.num_questions_to_play = num_questions
-            self.player_scores = {username: 0 for username in self.connected_clients}
-            self.answer_arrival_order = []
+            self._game_questions = questions
+            self._players = dict(self.connected_clients)
+            for i, client in enumerate(self._players.values()):
+                client.join_order = i
+                client.score = 0
+                client.points = 0
+                client.answer = None
+            self._ranked = [(0, client.join_order, client) for client in self._players.values()]
+            self._score_version += 1
             self._log("=" * 40)
             self._log("STARTING GAME!")
             self._log(f"Number of questions: {num_questions}")
             self._log(f"Players: {list(self.connected_clients.keys())}")
-            for username, client_socket in self.connected_clients.items():
-                try:
-                    client_socket.send("GAME_START".encode('utf-8'))
-                    self._log(f"Sent GAME_START to '{username}'")
-                except socket.error as e:
-                    self._log(f"Error sending to '{username}': {e}")
+            clients = self._clients_snapshot
+        for username, client in clients:
+            if self._queue_send(client, _FRAME_GAME_START):
+                self._log(f"Sent GAME_START to '{username}'")
         self._log("Game Started!")
         self._log("=" * 40)
         self.start_game_button.config(state=tk.DISABLED)
@@ -176,80 +313,146 @@ class QuizServer:
     def _broadcast_current_question(self):
         if self.current_question_index >= self.num_questions_to_play:
             return
-        question = self.questions[self.current_question_index]
+        log = self._log
+        queue_send = self._queue_send
+        question = self._game_questions[self.current_question_index]
         q_num = self.current_question_index + 1
-        msg = f"QUES|{question['q']}|{question['options'][0]}|{question['options'][1]}|{question['options'][2]}"
-        self._log(f"--- Question {q_num}/{self.num_questions_to_play} ---")
-        self._log(f"Q: {question['q']}")
-        self._log(f"A) {question['options'][0]}")
-        self._log(f"B) {question['options'][1]}")
-        self._log(f"C) {question['options'][2]}")
-        self._log(f"Correct answer: {question['ans']}")
+        log(f"--- Question {q_num}/{self.num_questions_to_play} ---")
+        log(f"Q: {question.q}")
+        log(f"A) {question.a}")
+        log(f"B) {question.b}")
+        log(f"C) {question.c}")
+        log(f"Correct answer: {question.ans}")
+        payload = question.payload
         with self.clients_lock:
-            for username, client_socket in self.connected_clients.items():
+            self._answers_remaining = sum(
+                client.answer is None for client in self.connected_clients.values()
+            )
+            clients = self._clients_snapshot
+        for username, client in clients:
+            if queue_send(client, payload):
+                log(f"Sent question {q_num} to '{username}'")
+        log("Waiting for all answers...")
+
+    def _update_clients_snapshot(self):
+        self._clients_snapshot = tuple(self.connected_clients.items())
+
+    def _queue_send(self, client, payload):
+        outbox = client.outbox
+        if payload is not None and len(outbox) >= _OUTBOX_LIMIT:
+            self._log(f"Send queue full for '{client.username}', disconnecting")
+            try:
+                client.sock.shutdown(socket.SHUT_RDWR)
+            except socket.error:
+                pass
+            return False
+        outbox.append(payload)
+        client.write_evt.set()
+        return True
+
+    def _writer(self, client):
+        client_socket = client.sock
+        outbox = client.outbox
+        popleft = outbox.popleft
+        write_evt = client.write_evt
+        while True:
+            write_evt.wait()
+            write_evt.clear()
+            buffers = []
+            closing = False
+            while outbox:
+                payload = popleft()
+                if payload is None:
+                    closing = True
+                    break
+                if type(payload) is list:
+                    buffers.extend(payload)
+                else:
+                    buffers.append(payload)
+            if buffers:
                 try:
-                    client_socket.send(msg.encode('utf-8'))
-                    self._log(f"Sent question {q_num} to '{username}'")
+                    _sendmsg_all(client_socket, buffers)
                 except socket.error as e:
-                    self._log(f"Error sending to '{username}': {e}")
-        self._log("Waiting for all answers...")
+                    if self.is_running:
+                        self._log(f"Error sending to '{client.username}': {e}")
+                    try:
+                        client_socket.shutdown(socket.SHUT_RDWR)
+                    except socket.error:
+                        pass
+                    return
+            if closing:
+                return
 
     def _process_answer(self, username, answer):
+        answer = _ANS_CANON.get(answer, answer)
         with self.clients_lock:
             if not self.game_in_progress:
                 return
-            if username in self.current_answers:
+            client = self.connected_clients.get(username)
+            if client is None or client.answer is not None:
                 return
-            self.current_answers[username] = answer
-            self.answer_arrival_order.append(username)
-            self._log(f"[{username}] answered: {answer}")
-            if len(self.current_answers) == len(self.connected_clients):
-                self._all_answers_received()
+            client.answer = answer
+            self._answer_seq += 1
+            client.answer_seq = self._answer_seq
+            if (
+                self._first_correct is None
+                and answer == self._game_questions[self.current_question_index].ans
+            ):
+                self._first_correct = client
+            self._answers_remaining -= 1
+            all_answered = self._answers_remaining == 0
+        self._log(f"[{username}] answered: {answer}")
+        if all_answered:
+            self._all_answers_received()
+
+    def _add_points(self, client, points):
+        ranked = self._ranked
+        del ranked[bisect.bisect_left(ranked, (-client.score, client.join_order))]
+        client.score += points
+        bisect.insort(ranked, (-client.score, client.join_order, client))
+        self._score_version += 1
 
     def _generate_scoreboard(self):
-        sorted_players = sorted(
-            self.player_scores.items(),
-            key=lambda x: x[1],
-            reverse=True
-        )
-
+        if self._cached_version == self._score_version:
+            return self._cached_scoreboard
         scoreboard_lines = []
+        append_line = scoreboard_lines.append
         current_rank = 1
-        prev_score = None
+        prev_neg_score = None
 
-        for i, (username, score) in enumerate(sorted_players):
-            if prev_score is not None and score < prev_score:
-                current_rank = i + 1
+        for i, (neg_score, _, client) in enumerate(self._ranked, 1):
+            if neg_score != prev_neg_score:
+                current_rank = i
+                prev_neg_score = neg_score
 
-            if username not in self.connected_clients:
+            if not client.connected:
                 label = " (disconnected)"
             else:
                 label = ""
 
-            scoreboard_lines.append(f"{current_rank}. {username} - {score}{label}")
-            prev_score = score
+            append_line(f"{current_rank}. {client.username} - {-neg_score}{label}")
 
-        return "\n".join(scoreboard_lines)
+        scoreboard = "\n".join(scoreboard_lines)
+        self._cached_scoreboard = scoreboard
+        self._cached_scoreboard_bytes = scoreboard.encode('utf-8')
+        self._cached_version = self._score_version
+        return scoreboard
 
-    def _broadcast_scores(
-        self,
-        points_this_round,
-        correct_answer,
-        first_correct_username,
-        num_correct
-    ):
+    def _broadcast_scores(self, correct_answer, first_correct, num_correct):
+        log = self._log
+        queue_send = self._queue_send
         scoreboard = self._generate_scoreboard()
-        self._log("Scoreboard:")
-        for line in scoreboard.split("\n"):
-            self._log(line)
+        log("Scoreboard:")
+        self._log_lines(scoreboard.split("\n"))
 
     
 
-        for username, client_socket in self.connected_clients.items():
-            was_correct = self.current_answers.get(username) == correct_answer
+        scoreboard_bytes = self._cached_scoreboard_bytes
+        for username, client in self._clients_snapshot:
+            was_correct = client.answer == correct_answer
 
             if (
-                username == first_correct_username
+                client is first_correct
                 and was_correct
                 and num_correct >= 2
             ):
@@ -259,76 +462,79 @@ class QuizServer:
             else:
                 result = "Wrong"
 
-            points = points_this_round.get(username, 0)
-            total = self.player_scores.get(username, 0)
-            msg = f"SCORE|{result}|{points}|{total}|{scoreboard}"
-
-            try:
-                client_socket.send(msg.encode('utf-8'))
-                self._log(
+            points = client.points
+            total = client.score
+            parts = [
+                b"SCORE|", _encode_field(result),
+                b"|", _encode_field(points),
+                b"|", _encode_field(total),
+                b"|", scoreboard_bytes
+            ]
+
+            if queue_send(client, encode_frame_parts(parts)):
+                log(
                     f"Sent score to '{username}': {result}, "
                     f"+{points} pts, total: {total}"
                 )
-            except socket.error as e:
-                self._log(f"Error sending score to '{username}': {e}")
 
-    def _broadcast_disconnect(self, disconnected_username):
-        msg = f"DISCONNECT|{disconnected_username}"
-        for username, client_socket in self.connected_clients.items():
-            try:
-                client_socket.send(msg.encode('utf-8'))
-            except socket.error:
-                pass
+    def _broadcast_disconnect(self, disconnected_username, username_bytes):
+        payload = encode_frame(_DISCONNECT_PREFIX + username_bytes)
+        for _, client in self._clients_snapshot:
+            self._queue_send(client, payload)
         self._log(f"Broadcasted disconnect of '{disconnected_username}' to all clients")
 
     def _all_answers_received(self):
+        log = self._log
+        add_points = self._add_points
         q_num = self.current_question_index + 1
-        self._log(f"All answers received for Question {q_num}")
-        correct_answer = self.questions[self.current_question_index]['ans']
-        self._log(f"Answers: {self.current_answers}")
-        self._log(f"Correct: {correct_answer}")
-        self._log(f"Answer order: {self.answer_arrival_order}")
+        log(f"All answers received for Question {q_num}")
+        correct_answer = self._game_questions[self.current_question_index].ans
+        answered = sorted(
+            (client for client in self.connected_clients.values() if client.answer is not None),
+            key=attrgetter("answer_seq")
+        )
 
-        points_this_round = {}
+        num_correct = 0
+        answers = {}
+        round_log = []
+
+        for client in answered:
+            answers[client.username] = client.answer
+            if client.answer == correct_answer:
+                add_points(client, 1)
+                client.points = 1
+                num_correct += 1
+                round_log.append(f"{client.username}: +1 base point (correct)")
+            else:
+                round_log.append(f"{client.username}: 0 points (wrong)")
 
-        for username, answer in self.current_answers.items():
-            if username in self.connected_clients:
-                if answer == correct_answer:
-                    self.player_scores[username] += 1
-                    points_this_round[username] = 1
-                    self._log(f"{username}: +1 base point (correct)")
-                else:
-                    points_this_round[username] = 0
-                    self._log(f"{username}: 0 points (wrong)")
+        log(f"Answers: {answers}")
+        log(f"Correct: {correct_answer}")
+        log(f"Answer order: {list(answers)}")
 
-        correct_players = [
-            u for u in self.answer_arrival_order
-            if self.current_answers.get(u) == correct_answer and u in self.connected_clients
-        ]
-        first_correct_username = correct_players[0] if correct_players else None
+        first_correct = self._first_correct
 
-        if len(correct_players) >= 2 and first_correct_username is not None:
+        if num_correct >= 2 and first_correct is not None:
             bonus = len(self.connected_clients) - 1
-            self.player_scores[first_correct_username] += bonus
-            points_this_round[first_correct_username] += bonus
-            self._log(
-                f"Speed bonus: {first_correct_username} gets +{bonus} points "
+            add_points(first_correct, bonus)
+            first_correct.points += bonus
+            round_log.append(
+                f"Speed bonus: {first_correct.username} gets +{bonus} points "
                 "(first correct & multiple correct answers)!"
             )
+        self._log_lines(round_log)
 
-        self._broadcast_scores(
-            points_this_round,
-            correct_answer,
-            first_correct_username,
-            len(correct_players)
-        )
+        self._broadcast_scores(correct_answer, first_correct, num_correct)
 
-        self.current_answers.clear()
-        self.answer_arrival_order.clear()
+        for client in self._players.values():
+            client.answer = None
+            client.points = 0
+        self._answer_seq = 0
+        self._first_correct = None
         self.current_question_index += 1
 
         if self.current_question_index < self.num_questions_to_play:
-            self._log("-" * 30)
+            log("-" * 30)
             self.root.after(2000, self._broadcast_current_question)
         else:
             self._end_game()
@@ -337,24 +543,26 @@ class QuizServer:
         self._log("=" * 40)
         self._log("GAME OVER!")
         self._log("Final Scores:")
-        if self.player_scores:
+        if self._ranked:
             final_scoreboard = self._generate_scoreboard()
             for line in final_scoreboard.split("\n"):
                 self._log(f"  {line}")
         else:
             self._log("  No scores recorded")
         self._log("=" * 40)
-        for username, client_socket in self.connected_clients.items():
-            try:
-                client_socket.send("GAME_OVER".encode('utf-8'))
+        for username, client in self._clients_snapshot:
+            if self._queue_send(client, _FRAME_GAME_OVER):
                 self._log(f"Sent GAME_OVER to '{username}'")
-            except socket.error as e:
-                self._log(f"Error sending to '{username}': {e}")
         self.game_in_progress = False
         self.current_question_index = 0
-        self.current_answers.clear()
-        self.answer_arrival_order.clear()
-        self.player_scores.clear()
+        for client in self._players.values():
+            client.answer = None
+            client.points = 0
+        self._players = {}
+        self._answer_seq = 0
+        self._first_correct = None
+        self._ranked.clear()
+        self._score_version += 1
         self.num_questions_to_play = 0
         self._log("Game state reset. Ready for new game.")
         self._check_start_conditions()
@@ -373,127 +581,237 @@ class QuizServer:
             self.server_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
             self.server_socket.bind(('0.0.0.0', port))
             self.server_socket.listen(5)
+            self.server_socket.setblocking(False)
+            self._selector.register(self.server_socket, selectors.EVENT_READ)
+            self._wakeup_r, self._wakeup_w = socket.socketpair()
+            self._wakeup_r.setblocking(False)
+            self._selector.register(self._wakeup_r, selectors.EVENT_READ)
             self._log(f"Server started on 0.0.0.0:{port}")
             self._log("Waiting for connections...")
             self.start_button.config(state=tk.DISABLED)
             self.port_entry.config(state=tk.DISABLED)
             self.is_running = True
-            listener_thread = threading.Thread(target=self._listen_for_clients, daemon=True)
-            listener_thread.start()
+            io_thread = threading.Thread(target=self._io_loop, daemon=True)
+            io_thread.start()
         except socket.error as e:
             self._log(f"Error starting server: {e}")
             messagebox.showerror("Socket Error", f"Failed to start server: {e}")
 
-    def _listen_for_clients(self):
-        while self.is_running:
-            try:
-                client_socket, client_address = self.server_socket.accept()
-                client_ip = client_address[0]
-                client_port = client_address[1]
-                self._log(f"Client connected: {client_ip}:{client_port}")
-                client_thread = threading.Thread(
-                    target=self._handle_client,
-                    args=(client_socket, client_address),
-                    daemon=True
-                )
-                client_thread.start()
-            except socket.error as e:
-                if self.is_running:
-                    self._log(f"Socket error: {e}")
-                break
-
-    def _handle_client(self, client_socket, client_address):
+    def _accept_client(self):
+        try:
+            client_socket, client_address = self.server_socket.accept()
+        except BlockingIOError:
+            return
+        except socket.error as e:
+            if self.is_running:
+                self._log(f"Socket error: {e}")
+            return
+        try:
+            _apply_sock_opts(client_socket)
+        except socket.error:
+            client_socket.close()
+            return
         client_ip = client_address[0]
         client_port = client_address[1]
-        username = None
+        self._log(f"Client connected: {client_ip}:{client_port}")
+        self._selector.register(
+            client_socket,
+            selectors.EVENT_READ,
+            (None, client_ip, client_port, bytearray())
+        )
+
+    def _authenticate(self, client_socket, client_ip, client_port, rx_buf, username_data):
         try:
-            username_data = client_socket.recv(1024)
-            if not username_data:
-                self._log(f"Client {client_ip}:{client_port} disconnected before authentication")
-                client_socket.close()
-                return
             username = username_data.decode('utf-8').strip()
-            self._log(f"Received username: '{username}' from {client_ip}:{client_port}")
-            if self.game_in_progress:
-                self._log(f"Rejecting '{username}' (game already in progress)")
-                try:
-                    client_socket.send("REJECT|GAME_IN_PROGRESS".encode('utf-8'))
-                except socket.error:
-                    pass
-                client_socket.close()
-                self._log(f"Connection closed with {client_ip}:{client_port}")
-                self._log("-" * 40)
-                return
-            with self.clients_lock:
-                if username in self.connected_clients:
-                    self._log(f"Username '{username}' is already taken. Rejecting connection.")
-                    client_socket.send("REJECT".encode('utf-8'))
-                    client_socket.close()
-                    self._log(f"Connection closed with {client_ip}:{client_port}")
-                    self._log("-" * 40)
-                    return
-                else:
-                    self.connected_clients[username] = client_socket
-                    self._log(f"Username '{username}' accepted. Client added to lobby.")
-            client_socket.send("OK".encode('utf-8'))
-            self._log(f"Sent 'OK' to {username}")
-            self._log(f"Connected clients: {list(self.connected_clients.keys())}")
-            self._check_start_conditions()
-            while self.is_running:
-                data = client_socket.recv(1024)
-                if data:
-                    message = data.decode('utf-8')
-                    if message.startswith("ANS:"):
-                        answer = message[4:].strip().upper()
-                        self._process_answer(username, answer)
-                    else:
-                        self._log(f"[{username}]: {message}")
-                else:
-                    self._log(f"Client '{username}' disconnected")
+        except UnicodeDecodeError:
+            self._log(f"Rejecting {client_ip}:{client_port} (username is not valid UTF-8)")
+            self._reject(client_socket, client_ip, client_port, _FRAME_REJECT)
+            return None
+        self._log(f"Received username: '{username}' from {client_ip}:{client_port}")
+        if self.game_in_progress:
+            self._log(f"Rejecting '{username}' (game already in progress)")
+            self._reject(client_socket, client_ip, client_port, _FRAME_REJECT_IN_PROGRESS)
+            return None
+        with self.clients_lock:
+            if username in self.connected_clients:
+                self._log(f"Username '{username}' is already taken. Rejecting connection.")
+                self._reject(client_socket, client_ip, client_port, _FRAME_REJECT)
+                return None
+            client = Client(username, client_socket, username.encode('utf-8'))
+            self._queue_send(client, _FRAME_OK)
+            self.connected_clients[username] = client
+            self._update_clients_snapshot()
+            threading.Thread(
+                target=self._writer,
+                args=(client,),
+                daemon=True
+            ).start()
+            self._log(f"Username '{username}' accepted. Client added to lobby.")
+        self._log(f"Sent 'OK' to {username}")
+        self._log(f"Connected clients: {[name for name, _ in self._clients_snapshot]}")
+        self._check_start_conditions()
+        self._selector.modify(
+            client_socket,
+            selectors.EVENT_READ,
+            (username, client_ip, client_port, rx_buf)
+        )
+        return username
+
+    def _reject(self, client_socket, client_ip, client_port, frame):
+        self._selector.unregister(client_socket)
+        try:
+            client_socket.sendall(frame)
+        except socket.error:
+            pass
+        client_socket.close()
+        self._log(f"Connection closed with {client_ip}:{client_port}")
+        self._log("-" * 40)
+
+    def _io_loop(self):
+        selector = self._selector
+        wakeup = self._wakeup_r
+        while self.is_running:
+            for key, _ in selector.select():
+                if key.data is not None:
+                    try:
+                        self._on_readable(key.fileobj, key.data)
+                    except Exception as e:
+                        self._log(f"Error handling client data: {e}")
+                        try:
+                            username = selector.get_key(key.fileobj).data[0]
+                        except (KeyError, ValueError):
+                            continue
+                        self._drop_client(username, key.fileobj)
+                elif key.fileobj is wakeup:
                     break
+                else:
+                    self._accept_client()
+        selector.close()
+        wakeup.close()
+        self._wakeup_w.close()
+
+    def _on_readable(self, client_socket, client):
+        username, client_ip, client_port, rx_buf = client
+        recv_view = self._recv_view
+        try:
+            if _TCP_QUICKACK is not None:
+                client_socket.setsockopt(socket.IPPROTO_TCP, _TCP_QUICKACK, 1)
+            received = client_socket.recv_into(recv_view)
         except socket.error as e:
             if self.is_running:
                 self._log(f"Error with client {client_ip}:{client_port}: {e}")
-        finally:
-            if username:
-                with self.clients_lock:
-                    if username in self.connected_clients:
-                        del self.connected_clients[username]
-                        self._log(f"Removed '{username}' from connected clients")
-                        self._log(f"Connected clients: {list(self.connected_clients.keys())}")
-                        self._broadcast_disconnect(username)
-                        if self.game_in_progress:
-                            self._log(f"Player '{username}' left during active game!")
-   
-                            if username in self.current_answers:
-                                del self.current_answers[username]
-                                self._log(f"Removed '{username}' from current answers")
-                            if username in self.answer_arrival_order:
-                                self.answer_arrival_order.remove(username)
-                            if len(self.connected_clients) < 2:
-                                self._log("Not enough players remaining! Ending game...")
-                                self._end_game()
-                            else:
-                                if len(self.current_answers) > 0 and len(self.current_answers) >= len(self.connected_clients):
-                                    self._log("All remaining players have answered. Proceeding...")
-                                    self._all_answers_received()
-                self._check_start_conditions()
+            self._drop_client(username, client_socket)
+            return
+        if not received:
+            if username is None:
+                self._log(f"Client {client_ip}:{client_port} disconnected before authentication")
+            else:
+                self._log(f"Client '{username}' disconnected")
+            self._drop_client(username, client_socket)
+            return
+        rx_buf += recv_view[:received]
+        while _MSG_DONTWAIT and received == len(recv_view):
             try:
-                client_socket.close()
+                received = client_socket.recv_into(recv_view, 0, _MSG_DONTWAIT)
             except socket.error:
-                pass
-            self._log("-" * 40)
+                break
+            rx_buf += recv_view[:received]
+        if username is None:
+            try:
+                username_data = next_frame(rx_buf)
+            except ValueError as e:
+                self._log(f"Error with client {client_ip}:{client_port}: {e}")
+                self._drop_client(username, client_socket)
+                return
+            if username_data is None:
+                return
+            username = self._authenticate(
+                client_socket, client_ip, client_port, rx_buf, username_data
+            )
+            if username is None:
+                return
+        try:
+            frames = split_frames(rx_buf)
+        except ValueError as e:
+            self._log(f"Error with client '{username}': {e}")
+            self._drop_client(username, client_socket)
+            return
+        for frame in frames:
+            if frame[:4] == b"ANS:":
+                answer = frame[4:].strip().decode('ascii', 'replace').upper()
+                self._process_answer(username, answer)
+            else:
+                self._log(f"[{username}]: {frame.decode('utf-8', 'replace')}")
+
+    def _drop_client(self, username, client_socket):
+        try:
+            self._selector.unregister(client_socket)
+        except (KeyError, ValueError):
+            pass
+        end_game = proceed = False
+        with self.clients_lock:
+            client = self.connected_clients.pop(username, None)
+            if client is not None:
+                client.connected = False
+                self._update_clients_snapshot()
+                self._score_version += 1
+                self._queue_send(client, None)
+                self._log(f"Removed '{username}' from connected clients")
+                self._log(f"Connected clients: {list(self.connected_clients.keys())}")
+                self._broadcast_disconnect(username, client.username_bytes)
+                if self.game_in_progress:
+                    self._log(f"Player '{username}' left during active game!")
+   
+                    if client.answer is not None:
+                        client.answer = None
+                        self._log(f"Removed '{username}' from current answers")
+                    else:
+                        self._answers_remaining -= 1
+                    if client is self._first_correct:
+                        correct_answer = self._game_questions[self.current_question_index].ans
+                        self._first_correct = min(
+                            (
+                                other for other in self.connected_clients.values()
+                                if other.answer == correct_answer
+                            ),
+                            key=attrgetter("answer_seq"),
+                            default=None
+                        )
+                    if len(self.connected_clients) < 2:
+                        end_game = True
+                    else:
+                        answered = any(other.answer is not None for other in self.connected_clients.values())
+                        proceed = answered and self._answers_remaining <= 0
+        if end_game:
+            self._log("Not enough players remaining! Ending game...")
+            self._end_game()
+        elif proceed:
+            self._log("All remaining players have answered. Proceeding...")
+            self._all_answers_received()
+        self._check_start_conditions()
+        try:
+            client_socket.close()
+        except socket.error:
+            pass
+        self._log("-" * 40)
 
     def _on_closing(self):
         self.is_running = False
         self.game_in_progress = False
+        if self._wakeup_w:
+            try:
+                self._wakeup_w.send(b"\0")
+            except socket.error:
+                pass
         with self.clients_lock:
-            for username, client_socket in self.connected_clients.items():
+            for client in self.connected_clients.values():
+                self._queue_send(client, None)
                 try:
-                    client_socket.close()
+                    client.sock.close()
                 except socket.error:
                     pass
             self.connected_clients.clear()
+            self._update_clients_snapshot()
         if self.server_socket:
             try:
                 self.server_socket.close()